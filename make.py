@@ -2,53 +2,188 @@
 
 import argparse
 import os
-
-from litex.soc.integration.builder import Builder
-
-from soc_linux import SoCLinux
-from soc_picorv32 import SoCPicorv32
+import re
+import json
+import sys
+import shlex
+import shutil
+import hashlib
+import time
+import socket
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# OpenOCD session ----------------------------------------------------------------------------------
+
+# Persistent OpenOCD process driven through its Tcl RPC server (avoids re-initializing JTAG per operation)
+class OpenOCDSession:
+    token = b"\x1a"
+
+    def __init__(self, config, port=6666, jtag_freq=None):
+        self.config    = config
+        self.port      = port
+        self.jtag_freq = jtag_freq
+
+    def open(self):
+        commands = ["tcl_port {}".format(self.port), "gdb_port disabled", "telnet_port disabled"]
+        if self.jtag_freq is not None:
+            commands.append("adapter_khz {}".format(self.jtag_freq))
+        commands.append("init")
+        # Our commands must not go to another server (another OpenOCD) already listening on the port
+        with socket.socket() as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                s.bind(("127.0.0.1", self.port))
+            except OSError:
+                raise OSError("OpenOCD Tcl port {} already in use".format(self.port))
+        self.process = subprocess.Popen(["openocd", "-f", self.config, "-c", "; ".join(commands)])
+        try:
+            for i in range(100):
+                if self.process.poll() is not None:
+                    raise OSError("OpenOCD exited with code {}".format(self.process.returncode))
+                try:
+                    self.socket = socket.create_connection(("127.0.0.1", self.port))
+                    return self
+                except ConnectionRefusedError:
+                    time.sleep(0.1)
+            raise OSError("Unable to connect to OpenOCD Tcl server")
+        except BaseException:
+            self.process.kill()
+            self.process.wait()
+            raise
+
+    def close(self):
+        try:
+            self.send("shutdown")
+        except OSError:
+            pass
+        self.socket.close()
+        self.process.wait()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, command):
+        self.socket.sendall(command.encode() + self.token)
+        data = b""
+        while not data.endswith(self.token):
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                raise OSError("OpenOCD connection closed")
+            data += chunk
+        return data[:-len(self.token)].decode()
+
+    def run(self, command):
+        # Tcl errors are returned as regular results: catch them to report failures
+        result = self.send("list [catch {{{}}} r] $r".format(command))
+        code, _, message = result.partition(" ")
+        if code != "0":
+            raise OSError("OpenOCD command '{}' failed: {}".format(command, message))
+        return message
+
+    def jtagspi_program_diff(self, filename, address, sector_size=0x10000):
+        # Read back the flash and only program the sectors that differ from the file
+        with open(filename, "rb") as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            readback = os.path.join(tmp_dir, "readback.bin")
+            self.run("flash read_bank 0 {{{}}} 0x{:x} 0x{:x}".format(readback, address, len(data)))
+            with open(readback, "rb") as f:
+                current = f.read()
+            # Group consecutive differing sectors
+            ranges = []
+            for start in range(0, len(data), sector_size):
+                end = min(start + sector_size, len(data))
+                if data[start:end] != current[start:end]:
+                    if ranges and ranges[-1][1] == start:
+                        ranges[-1][1] = end
+                    else:
+                        ranges.append([start, end])
+            for start, end in ranges:
+                chunk = os.path.join(tmp_dir, "chunk.bin")
+                with open(chunk, "wb") as f:
+                    f.write(data[start:end])
+                self.run("jtagspi_program {{{}}} 0x{:x}".format(chunk, address + start))
+        return sum(end - start for start, end in ranges)
 
 # Board definition----------------------------------------------------------------------------------
 
 class Board:
+    programmer = "openfpgaloader"
+    jtag_freq   = None  # in KHz, None: loader's default
+    force_flash = False # program all flash regions, even unchanged ones
+
     def __init__(self, soc_cls, soc_capabilities):
         self.soc_cls = soc_cls
         self.soc_capabilities = soc_capabilities
 
+    def load_xilinx_bitstream(self, filename, openfpgaloader_board):
+        if self.programmer == "vivado":
+            from litex.build.xilinx import VivadoProgrammer
+            prog = VivadoProgrammer()
+            prog.load_bitstream(filename)
+        else:
+            # openFPGALoader avoids Vivado/hw_server startup just to load a bitstream
+            cmd = ["openFPGALoader", "-b", openfpgaloader_board]
+            if self.jtag_freq is not None:
+                cmd += ["--freq", str(self.jtag_freq*1000)]
+            subprocess.run(cmd + [filename], check=True)
+
     def load(self):
         raise NotImplementedError
 
     def flash(self):
         raise NotImplementedError
 
+    def close(self):
+        pass
+
 # Arty support -------------------------------------------------------------------------------------
 
 class Arty(Board):
+    flash_regions = [
+        ("build/arty/gateware/top.bin", 0x00000000), # FPGA image:  loaded at startup
+        ("buildroot/Image",             0x00400000), # Linux Image: copied to 0xc0000000 by bios
+        ("buildroot/rootfs.cpio",       0x00800000), # File System: copied to 0xc0800000 by bios
+        ("buildroot/rv32.dtb",          0x00f00000), # Device tree: copied to 0xc1000000 by bios
+        ("emulator/emulator.bin",       0x00f80000), # MM Emulator: copied to 0x20000000 by bios
+    ]
+
     def __init__(self):
         from litex.boards.targets import arty
         Board.__init__(self, arty.EthernetSoC, "serial+ethernet+spiflash")
+        self.session = None
+
+    def openocd(self):
+        # OpenOCD session shared between load and flash
+        if self.session is None:
+            self.session = OpenOCDSession("prog/openocd_xilinx.cfg", jtag_freq=self.jtag_freq).open()
+        return self.session
 
     def load(self):
-        from litex.build.openocd import OpenOCD
-        prog = OpenOCD("prog/openocd_xilinx.cfg")
-        prog.load_bitstream("build/arty/gateware/top.bit")
+        self.openocd().run("pld load 0 {build/arty/gateware/top.bit}")
 
     def flash(self):
-        flash_regions = {
-            "build/arty/gateware/top.bin": "0x00000000", # FPGA image:  loaded at startup
-            "buildroot/Image":             "0x00400000", # Linux Image: copied to 0xc0000000 by bios
-            "buildroot/rootfs.cpio":       "0x00800000", # File System: copied to 0xc0800000 by bios
-            "buildroot/rv32.dtb":          "0x00f00000", # Device tree: copied to 0xc1000000 by bios
-            "emulator/emulator.bin":       "0x00f80000", # MM Emulator: copied to 0x20000000 by bios
-        }
-        from litex.build.openocd import OpenOCD
-        prog = OpenOCD("prog/openocd_xilinx.cfg",
-            flash_proxy_basename="prog/bscan_spi_xc7a35t.bit")
-        prog.set_flash_proxy_dir(".")
-        for filename, base in flash_regions.items():
-            base = int(base, 16)
-            print("Flashing {} at 0x{:08x}".format(filename, base))
-            prog.flash(base, filename)
+        session = self.openocd()
+        session.run("jtagspi_init 0 {prog/bscan_spi_xc7a35t.bit}")
+        for filename, base in self.flash_regions:
+            if self.force_flash:
+                print("Flashing {} at 0x{:08x}".format(filename, base))
+                session.run("jtagspi_program {{{}}} 0x{:x}".format(filename, base))
+            else:
+                print("Flashing {} at 0x{:08x} (changed sectors only)".format(filename, base))
+                changed = session.jtagspi_program_diff(filename, base)
+                print("{} bytes programmed".format(changed))
+        session.run("fpga_program")
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
 
 # NeTV2 support ------------------------------------------------------------------------------------
 
@@ -58,9 +193,7 @@ class NeTV2(Board):
         Board.__init__(self, netv2.EthernetSoC, "serial+ethernet")
 
     def load(self):
-        from litex.build.xilinx import VivadoProgrammer
-        prog = VivadoProgrammer()
-        prog.load_bitstream("build/netv2/gateware/top.bit")
+        self.load_xilinx_bitstream("build/netv2/gateware/top.bit", "netv2")
 
 # Genesys2 support ---------------------------------------------------------------------------------
 
@@ -70,9 +203,7 @@ class Genesys2(Board):
         Board.__init__(self, genesys2.BaseSoC, "serial")
 
     def load(self):
-        from litex.build.xilinx import VivadoProgrammer
-        prog = VivadoProgrammer()
-        prog.load_bitstream("build/genesys2/gateware/top.bit")
+        self.load_xilinx_bitstream("build/genesys2/gateware/top.bit", "genesys2")
 
 # KCU105 support -----------------------------------------------------------------------------------
 
@@ -82,9 +213,7 @@ class KCU105(Board):
         Board.__init__(self, kcu105.EthernetSoC, "serial+ethernet")
 
     def load(self):
-        from litex.build.xilinx import VivadoProgrammer
-        prog = VivadoProgrammer()
-        prog.load_bitstream("build/kcu105/gateware/top.bit")
+        self.load_xilinx_bitstream("build/kcu105/gateware/top.bit", "kcu105")
 
 
 # Nexys4DDR support --------------------------------------------------------------------------------
@@ -95,9 +224,7 @@ class Nexys4DDR(Board):
         Board.__init__(self, nexys4ddr.EthernetSoC, "serial+ethernet")
 
     def load(self):
-        from litex.build.xilinx import VivadoProgrammer
-        prog = VivadoProgrammer()
-        prog.load_bitstream("build/nexys4ddr/gateware/top.bit")
+        self.load_xilinx_bitstream("build/nexys4ddr/gateware/top.bit", "nexys4ddr")
 
 # NexysVideo support --------------------------------------------------------------------------------
 
@@ -107,9 +234,7 @@ class NexysVideo(Board):
         Board.__init__(self, nexys_video.EthernetSoC, "serial")
 
     def load(self):
-        from litex.build.xilinx import VivadoProgrammer
-        prog = VivadoProgrammer(vivado_path=vivado_path)
-        prog.load_bitstream("build/nexys_video/gateware/top.bit")
+        self.load_xilinx_bitstream("build/nexys_video/gateware/top.bit", "nexysVideo")
 
 # MiniSpartan6 support -----------------------------------------------------------------------------
 
@@ -119,7 +244,10 @@ class MiniSpartan6(Board):
         Board.__init__(self, minispartan6.BaseSoC, "serial")
 
     def load(self):
-        os.system("xc3sprog -c ftdi build/minispartan6/gateware/top.bit")
+        cmd = ["xc3sprog", "-c", "ftdi"]
+        if self.jtag_freq is not None:
+            cmd += ["-J", str(self.jtag_freq*1000)]
+        subprocess.run(cmd + ["build/minispartan6/gateware/top.bit"], check=True)
 
 
 # Versa ECP5 support -------------------------------------------------------------------------------
@@ -130,7 +258,10 @@ class VersaECP5(Board):
         Board.__init__(self, versa_ecp5.EthernetSoC, "serial+ethernet")
 
     def load(self):
-        os.system("openocd -f prog/ecp5-versa5g.cfg -c \"transport select jtag; init; svf build/versa_ecp5/gateware/top.svf; exit\"")
+        script = ["transport select jtag", "init", "svf build/versa_ecp5/gateware/top.svf", "exit"]
+        if self.jtag_freq is not None:
+            script.insert(0, "adapter_khz {}".format(self.jtag_freq))
+        subprocess.run(["openocd", "-f", "prog/ecp5-versa5g.cfg", "-c", "; ".join(script)], check=True)
 
 # ULX3S support ------------------------------------------------------------------------------------
 
@@ -140,7 +271,7 @@ class ULX3S(Board):
         Board.__init__(self, ulx3s.BaseSoC, "serial")
 
     def load(self):
-        os.system("ujprog build/ulx3s/gateware/top.svf")
+        subprocess.run(["ujprog", "build/ulx3s/gateware/top.svf"], check=True)
 
 # De0Nano support ------------------------------------------------------------------------------------
 
@@ -168,6 +299,20 @@ class QmaTech(Board):
 
 # Main ---------------------------------------------------------------------------------------------
 
+# Boards built with Vivado (unless built with SymbiFlow for symbiflow_boards)
+vivado_boards    = ["arty", "netv2", "genesys2", "kcu105", "nexys4ddr", "nexys_video"]
+symbiflow_boards = ["arty", "netv2", "nexys4ddr"]
+# Boards built with Trellis (or Diamond)
+ecp5_boards      = ["versa_ecp5", "ulx3s"]
+
+# Boards supported by each --toolchain
+toolchain_boards = {
+    "vivado":    vivado_boards,
+    "symbiflow": symbiflow_boards,
+    "trellis":   ecp5_boards,
+    "diamond":   ecp5_boards,
+}
+
 supported_boards = {
     # Xilinx
     "arty":         Arty,
@@ -186,49 +331,460 @@ supported_boards = {
     "qmatech":      QmaTech,
 }
 
+# Gateware cache -----------------------------------------------------------------------------------
+
+gateware_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "litex-ipcache")
+
+# Generated files describing the gateware (sources, constraints, build scripts, memory init)
+gateware_sources_exts = [".v", ".vhd", ".init", ".xdc", ".tcl", ".ucf", ".lpf", ".ys", ".qsf", ".sdc", ".sh"]
+
+# Files produced by the vendor toolchains that are needed to load/flash the boards
+gateware_products = ["top.bit", "top.bin", "top.svf", "top.sof"]
+
+# Version commands of all the tools run by each toolchain flow
+toolchain_version_cmds = {
+    "XilinxVivadoToolchain":   [["vivado", "-version"]],
+    "SymbiflowToolchain":      [["yosys", "-V"], ["vpr", "--version"], ["genfasm", "--version"]],
+    "LatticeTrellisToolchain": [["yosys", "-V"], ["nextpnr-ecp5", "--version"], ["ecppack", "--version"]],
+    "AlteraQuartusToolchain":  [["quartus_sh", "--version"]],
+}
+
+ise_toolchain_path = "/opt/Xilinx" # LiteX's default ISE toolchain path
+
+def get_toolchain_install(toolchain):
+    # ISE/Diamond tools have no version query: use their install (in a directory named after the
+    # version), selected like LiteX does (ISE: latest release settings, Diamond: diamondc from PATH)
+    if toolchain == "XilinxISEToolchain":
+        from litex.build.xilinx import common
+        return common.settings(ise_toolchain_path, sub="ISE_DS")
+    if toolchain == "LatticeDiamondToolchain":
+        diamondc = shutil.which("diamondc")
+        if diamondc is None:
+            raise OSError("diamondc not found in PATH")
+        return os.path.realpath(diamondc)
+    return None
+
+def get_toolchain_version(soc, use_daemon=False):
+    # None when the version of one of the flow's tools can't be read: gateware must then not be cached
+    toolchain = type(soc.platform.toolchain).__name__
+    try:
+        install = get_toolchain_install(toolchain)
+    except OSError:
+        return None
+    if install is not None:
+        return toolchain + " " + install
+    if toolchain not in toolchain_version_cmds:
+        return None
+    # Whitespace is normalized: Vivado daemon and "vivado -version" must give the same version
+    if toolchain == "XilinxVivadoToolchain" and use_daemon:
+        try:
+            return toolchain + " " + " ".join(get_vivado_daemon().run("version").split())
+        except (OSError, RuntimeError):
+            pass # Daemon failures are handled (and the daemon restarted) by run_vivado_script
+    versions = [toolchain]
+    for command in toolchain_version_cmds[toolchain]:
+        try:
+            if toolchain == "XilinxVivadoToolchain":
+                command = vivado_command(command)
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError:
+            return None
+        if result.returncode != 0:
+            return None
+        versions.append(" ".join(result.stdout.decode().split()))
+    return " ".join(versions)
+
+def get_gateware_hash(soc, gateware_dir, toolchain_version):
+    h = hashlib.blake2b()
+    h.update(toolchain_version.encode())
+    # External sources (CPU, cores) referenced by the generated build scripts
+    for filename in sorted(set(source[0] for source in soc.platform.sources)):
+        h.update(filename.encode())
+        with open(filename, "rb") as f:
+            h.update(f.read())
+    # Generated sources
+    for filename in sorted(os.listdir(gateware_dir)):
+        if os.path.splitext(filename)[1] in gateware_sources_exts:
+            h.update(filename.encode())
+            with open(os.path.join(gateware_dir, filename), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def restore_gateware(gateware_hash, gateware_dir):
+    cache_dir = os.path.join(gateware_cache_dir, gateware_hash)
+    if not os.path.isdir(cache_dir):
+        return False
+    for filename in os.listdir(cache_dir):
+        shutil.copyfile(os.path.join(cache_dir, filename), os.path.join(gateware_dir, filename))
+    return True
+
+def store_gateware(gateware_hash, gateware_dir):
+    os.makedirs(gateware_cache_dir, exist_ok=True)
+    # Populate a temporary directory and rename it: concurrent builds never see a partial entry
+    tmp_dir = tempfile.mkdtemp(dir=gateware_cache_dir)
+    for filename in gateware_products:
+        if os.path.exists(os.path.join(gateware_dir, filename)):
+            shutil.copyfile(os.path.join(gateware_dir, filename), os.path.join(tmp_dir, filename))
+    try:
+        os.rename(tmp_dir, os.path.join(gateware_cache_dir, gateware_hash))
+    except OSError:
+        shutil.rmtree(tmp_dir)
+
+# Device tree ---------------------------------------------------------------------------------------
+
+dtb_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "litex-dtb")
+
+def compile_device_tree(board_name):
+    dts = "buildroot/board/litex_vexriscv/litex_vexriscv_{}.dts".format(board_name)
+    if not os.path.exists(dts):
+        print("{}: no device tree ({} not found)".format(board_name, dts))
+        return None
+    with open(dts, "rb") as f:
+        dtb_hash = hashlib.blake2b(board_name.encode() + f.read()).hexdigest()
+    dtb = os.path.join(dtb_cache_dir, dtb_hash + ".dtb")
+    if not os.path.exists(dtb):
+        os.makedirs(dtb_cache_dir, exist_ok=True)
+        tmp_dtb = dtb + ".{}.tmp".format(os.getpid())
+        try:
+            subprocess.run(["dtc", "-O", "dtb", "-o", tmp_dtb, dts], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print("{}: unable to compile device tree ({})".format(board_name, e))
+            if os.path.exists(tmp_dtb):
+                os.remove(tmp_dtb)
+            return None
+        os.rename(tmp_dtb, dtb)
+    return dtb
+
+# Vivado fast (incremental) flow -------------------------------------------------------------------
+
+vivado_toolchain_path = "/opt/Xilinx/Vivado" # LiteX's default Vivado toolchain path
+
+def is_vivado(soc):
+    return type(soc.platform.toolchain).__name__ == "XilinxVivadoToolchain"
+
+def vivado_command(command):
+    # Source Vivado's settings64.sh when vivado is not in PATH (as LiteX does when running Vivado)
+    if shutil.which("vivado") is not None:
+        return command
+    from litex.build.xilinx import common
+    try:
+        settings = common.settings(vivado_toolchain_path)
+    except OSError:
+        raise OSError("vivado not found in PATH nor Vivado settings in {}".format(vivado_toolchain_path))
+    return ["bash", "-c", "source {} && exec {}".format(shlex.quote(settings), " ".join(shlex.quote(c) for c in command))]
+
+def set_directive(command, directive):
+    if "-directive" in command:
+        return re.sub(r"-directive\s+\S+", "-directive " + directive, command)
+    return command + " -directive " + directive
+
+def patch_vivado_script(tcl_file, checkpoint):
+    # Runtime optimized synthesis/implementation, no physical optimizations and incremental
+    # place/route against the checkpoint of the previous build (when available).
+    script = []
+    with open(tcl_file, "r") as f:
+        for line in f.read().splitlines():
+            command = line.split(" ")[0]
+            if command == "phys_opt_design":
+                continue
+            elif command == "synth_design":
+                line = set_directive(line, "RuntimeOptimized")
+            elif command == "place_design":
+                if os.path.exists(checkpoint):
+                    script.append("read_checkpoint -incremental {{{}}}".format(checkpoint))
+                line = set_directive(line, "Quick")
+            elif command == "route_design":
+                line = set_directive(line, "Quick")
+            script.append(line)
+            if command == "route_design":
+                script.append("write_checkpoint -force {{{}}}".format(checkpoint))
+    with open(tcl_file, "w") as f:
+        f.write("\n".join(script) + "\n")
+
+# Vivado daemon ------------------------------------------------------------------------------------
+
+# Long-running Vivado Tcl shell (avoids Vivado startup per board, exits on EOF when we exit)
+class VivadoDaemon:
+    marker = "__vivado_daemon_done__"
+
+    def __init__(self):
+        self.process = subprocess.Popen(vivado_command(["vivado", "-mode", "tcl", "-nolog", "-nojournal"]),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+
+    def run(self, command):
+        # Evaluate a Tcl command and return its result (newlines replaced by spaces)
+        self.process.stdin.write("\n".join([
+            "set rc [catch {{{}}} r]".format(command),
+            "set r [string map {\"\\n\" \" \"} $r]",
+            "puts \"{} $rc $r\"".format(self.marker),
+        ]) + "\n")
+        self.process.stdin.flush()
+        for line in self.process.stdout:
+            if self.marker in line:
+                rc, _, r = line.split(self.marker)[1].strip().partition(" ")
+                if rc != "0":
+                    raise RuntimeError(r)
+                return r
+            print(line, end="")
+        raise OSError("Vivado daemon exited")
+
+    def source(self, tcl_file):
+        # LiteX scripts end with quit: drop it to keep the daemon alive
+        with open(tcl_file, "r") as f:
+            script = [l for l in f.read().splitlines() if l.strip() not in ["quit", "exit"]]
+        with tempfile.NamedTemporaryFile("w", suffix=".tcl", delete=False) as f:
+            f.write("\n".join(script) + "\n")
+        try:
+            self.run("close_project -quiet")
+            self.run("cd {{{}}}".format(os.path.abspath(os.path.dirname(tcl_file))))
+            try:
+                self.run("source {{{}}}".format(f.name))
+            except RuntimeError as e:
+                raise RuntimeError("Vivado failed on {}: {}".format(tcl_file, e))
+            finally:
+                self.run("cd {{{}}}".format(os.getcwd()))
+        finally:
+            os.remove(f.name)
+
+# One daemon per process: boards sharing it must be built by the same process (see build_boards)
+vivado_daemon = None
+
+def get_vivado_daemon():
+    global vivado_daemon
+    if vivado_daemon is None:
+        vivado_daemon = VivadoDaemon()
+    return vivado_daemon
+
+def run_vivado_script(tcl_file, use_daemon=False):
+    global vivado_daemon
+    if use_daemon:
+        try:
+            get_vivado_daemon().source(tcl_file)
+            return
+        except OSError as e:
+            print("Vivado daemon failed ({}), falling back to batch mode".format(e))
+            vivado_daemon = None
+    subprocess.run(vivado_command(["vivado", "-mode", "batch", "-source", os.path.basename(tcl_file)]),
+        cwd=os.path.dirname(tcl_file), check=True)
+
+# Build --------------------------------------------------------------------------------------------
+
+def create_soc(board_name, board, args):
+    from soc_linux import SoCLinux
+    soc_kwargs = {}
+    if board_name in ecp5_boards:
+        soc_kwargs["toolchain"] = "trellis"
+        if args.toolchain in ["trellis", "diamond"]:
+            soc_kwargs["toolchain"] = args.toolchain
+    if board_name in symbiflow_boards:
+        if args.toolchain == "symbiflow":
+            soc_kwargs["toolchain"] = "symbiflow"
+    soc = SoCLinux(board.soc_cls, **soc_kwargs)
+    if "spiflash" in board.soc_capabilities:
+        soc.add_spi_flash()
+    if "ethernet" in board.soc_capabilities:
+        soc.configure_ethernet(local_ip=args.local_ip, remote_ip=args.remote_ip)
+    soc.configure_boot()
+    return soc
+
+def build_gateware(board_name, board, soc, args):
+    from litex.soc.integration.builder import Builder
+    output_dir   = "build/" + board_name
+    gateware_dir = os.path.join(output_dir, "gateware")
+    build_script = os.path.join(gateware_dir, "build_top.sh")
+    vivado       = is_vivado(soc)
+    # Vivado script must be run directly (patched for --fast, or through the daemon)
+    run_vivado   = vivado and (args.fast or args.vivado_daemon)
+
+    toolchain_version = None
+    if not args.no_cache:
+        toolchain_version = get_toolchain_version(soc, use_daemon=vivado and args.vivado_daemon)
+        if toolchain_version is None:
+            print("{}: unable to get toolchain version, gateware cache disabled".format(board_name))
+    use_cache = toolchain_version is not None
+
+    if not use_cache and not run_vivado:
+        builder = Builder(soc, output_dir=output_dir)
+        builder.build()
+        return
+
+    # Generate gateware sources only, the toolchain is run below if needed
+    if os.path.exists(build_script):
+        os.remove(build_script)
+    builder = Builder(soc, output_dir=output_dir, compile_gateware=False)
+    builder.build()
+    if args.fast and run_vivado:
+        patch_vivado_script(os.path.join(gateware_dir, "top.tcl"),
+            checkpoint=os.path.abspath(os.path.join(output_dir, "incremental.dcp")))
+
+    gateware_hash = None
+    if use_cache:
+        gateware_hash = get_gateware_hash(soc, gateware_dir, toolchain_version)
+        if restore_gateware(gateware_hash, gateware_dir):
+            print("{}: gateware restored from cache ({})".format(board_name, gateware_hash[:16]))
+            return
+
+    # Run the toolchain on the generated sources (avoids elaborating the SoC and building the BIOS twice)
+    if vivado:
+        run_vivado_script(os.path.join(gateware_dir, "top.tcl"), use_daemon=args.vivado_daemon)
+    elif os.path.exists(build_script):
+        subprocess.run(["bash", os.path.basename(build_script)], cwd=gateware_dir, check=True)
+    else:
+        # No build script generated: platforms can only be finalized once, run the build on a fresh SoC
+        soc = create_soc(board_name, board, args)
+        builder = Builder(soc, output_dir=output_dir)
+        builder.build()
+    if gateware_hash is not None:
+        store_gateware(gateware_hash, gateware_dir)
+
+def build_board(board_name, args):
+    if args.build:
+        board = supported_boards[board_name]()
+        soc = create_soc(board_name, board, args)
+        build_gateware(board_name, board, soc, args)
+
+    return board_name
+
+def build_boards(board_names, args):
+    # Build boards sequentially in the same process (sharing its Vivado daemon)
+    for board_name in board_names:
+        build_board(board_name, args)
+    return board_names
+
+def load_board(board_name, dtb, args):
+    board = supported_boards[board_name]()
+    board.programmer  = args.programmer
+    board.jtag_freq   = args.jtag_freq
+    board.force_flash = args.force_flash
+
+    # Install board's device tree where flash/netboot expect it (with --board=all, an existing one may
+    # be another board's: remove it rather than flash/netboot it)
+    if dtb is not None:
+        shutil.copyfile(dtb, "buildroot/rv32.dtb")
+    elif args.board == "all" and os.path.exists("buildroot/rv32.dtb"):
+        print("{}: no device tree, removing buildroot/rv32.dtb".format(board_name))
+        os.remove("buildroot/rv32.dtb")
+
+    try:
+        if args.load:
+            board.load()
+
+        if args.flash:
+            board.flash()
+    finally:
+        board.close()
+
+def config_argv(config):
+    # Convert MAKE_CONFIG_JSON arguments to command line arguments (true: flag set, false/null: default)
+    argv = []
+    for key, value in config.items():
+        option = "--" + key.replace("_", "-")
+        if value is True:
+            argv.append(option)
+        elif value is not False and value is not None:
+            argv += [option, str(value)]
+    return argv
+
 def main():
     description = "Linux on LiteX-VexRiscv\n\n"
     description += "Available boards:\n"
-    for name in supported_boards.keys():
-        description += "- " + name + "\n"
-    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawTextHelpFormatter)
+    description += "".join("- " + name + "\n" for name in supported_boards.keys())
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawTextHelpFormatter,
+        epilog="Arguments can also be passed as JSON (from --dump-config) in MAKE_CONFIG_JSON.")
     parser.add_argument("--board", required=True, help="FPGA board")
+    parser.add_argument("--programmer", default="openfpgaloader", choices=["openfpgaloader", "vivado"], help="Xilinx bitstream loader")
+    parser.add_argument("--jtag-freq", default=None, type=int, help="JTAG frequency in KHz (OpenOCD/openFPGALoader/xc3sprog loaders)")
+    parser.add_argument("--toolchain", default=None, choices=["vivado", "symbiflow", "trellis", "diamond"],
+        help="gateware toolchain (vivado: Xilinx 7-series/Ultrascale boards, symbiflow: arty/netv2/nexys4ddr,\n"
+             "trellis/diamond: versa_ecp5/ulx3s; with --board=all: only for these boards)")
     parser.add_argument("--build", action="store_true", help="build bitstream")
     parser.add_argument("--load", action="store_true", help="load bitstream (to SRAM)")
     parser.add_argument("--flash", action="store_true", help="flash bitstream/images (to SPI Flash)")
+    parser.add_argument("--force-flash", action="store_true", help="flash all images (even unchanged ones)")
     parser.add_argument("--local-ip", default="192.168.1.50", help="local IP address")
     parser.add_argument("--remote-ip", default="192.168.1.100", help="remote IP address of TFTP server")
-    args = parser.parse_args()
+    parser.add_argument("--jobs", default=None, type=int, help="number of boards built in parallel (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="always rebuild gateware (bypass gateware cache)")
+    parser.add_argument("--clear-cache", action="store_true", help="clear gateware and device tree caches before building")
+    parser.add_argument("--fast", action="store_true", help="fast incremental build (Vivado only, relaxed timing optimizations, Vivado\n"
+             "from PATH or /opt/Xilinx/Vivado settings)")
+    parser.add_argument("--vivado-daemon", action="store_true", help="run Vivado builds in long-running Vivado processes (one per\n"
+             "--jobs worker, reused for the Vivado boards built by that worker)")
+    parser.add_argument("--dump-config", action="store_true", help="dump arguments as JSON (for MAKE_CONFIG_JSON) and exit")
+    argv = None
+    if "MAKE_CONFIG_JSON" in os.environ:
+        # Scripted use: arguments from JSON (dumped with --dump-config), parsed as command line ones
+        if sys.argv[1:]:
+            parser.error("arguments can't be combined with MAKE_CONFIG_JSON")
+        try:
+            config = json.loads(os.environ["MAKE_CONFIG_JSON"])
+        except ValueError as e:
+            parser.error("MAKE_CONFIG_JSON: invalid JSON ({})".format(e))
+        if not isinstance(config, dict):
+            parser.error("MAKE_CONFIG_JSON: arguments must be a JSON object")
+        argv = config_argv(config)
+    args = parser.parse_args(argv)
+
+    if args.toolchain is not None and args.board != "all" and args.board not in toolchain_boards[args.toolchain]:
+        parser.error("{} toolchain not supported on {} (only on {})".format(
+            args.toolchain, args.board, "/".join(toolchain_boards[args.toolchain])))
+
+    if args.dump_config:
+        del args.dump_config
+        print(json.dumps(vars(args)))
+        return
+
+    if args.clear_cache:
+        shutil.rmtree(gateware_cache_dir, ignore_errors=True)
+        shutil.rmtree(dtb_cache_dir, ignore_errors=True)
 
     if args.board == "all":
         board_names = list(supported_boards.keys())
     else:
         board_names = [args.board]
-    for board_name in board_names:
-        board = supported_boards[board_name]()
-        soc_kwargs = {}
-        if board_name in ["versa_ecp5", "ulx3s"]:
-            soc_kwargs["toolchain"] = "trellis"
-        if board_name in ["qmatech"]:
-            soc = SoCLinux(board.soc_cls, **soc_kwargs)
-        else:   
-            soc = SoCLinux(board.soc_cls, **soc_kwargs)
-        if "spiflash" in board.soc_capabilities:
-            soc.add_spi_flash()
-        if "ethernet" in board.soc_capabilities:
-            soc.configure_ethernet(local_ip=args.local_ip, remote_ip=args.remote_ip)
-        soc.configure_boot()
-        soc.compile_device_tree(board_name)
-
-        if args.build:
-            builder = Builder(soc, output_dir="build/" + board_name)
-            builder.build()
 
-        if args.load:
-            board.load()
-
-        if args.flash:
-            board.flash()
+    # Compile device trees concurrently (dtc runs as an external process)
+    with ThreadPoolExecutor(max_workers=len(board_names)) as executor:
+        dtbs = dict(zip(board_names, executor.map(compile_device_tree, board_names)))
+
+    # Group boards built by the same process: with --vivado-daemon, Vivado boards are spread over
+    # up to --jobs groups, each sharing a worker (and its daemon), other boards get their own
+    max_jobs = args.jobs or os.cpu_count()
+    daemon_board_names = []
+    if args.vivado_daemon:
+        daemon_board_names = [board_name for board_name in board_names if board_name in vivado_boards and
+            not (args.toolchain == "symbiflow" and board_name in symbiflow_boards)]
+    board_groups = []
+    if daemon_board_names:
+        daemon_groups = min(max_jobs, len(daemon_board_names))
+        board_groups += [daemon_board_names[i::daemon_groups] for i in range(daemon_groups)]
+    board_groups += [[board_name] for board_name in board_names if board_name not in daemon_board_names]
+
+    # Build board groups in parallel (SoC generation and gateware builds are independent per board)
+    # and load/flash boards sequentially as builds complete (shared USB/JTAG cables)
+    jobs = max(1, min(len(board_groups), max_jobs))
+    if args.build and jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        futures  = {executor.submit(build_boards, board_group, args): board_group for board_group in board_groups}
+        try:
+            for future in as_completed(futures):
+                board_group = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print("{}: build failed ({})".format(", ".join(board_group), e))
+                    raise
+                for board_name in board_group:
+                    print("{}: done".format(board_name))
+                    load_board(board_name, dtbs[board_name], args)
+        finally:
+            # Report failures right away: don't wait for running builds and cancel pending ones.
+            # (builds already running in a worker can't be cancelled, they finish before exit)
+            executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        for board_name in board_names:
+            build_board(board_name, args)
+            load_board(board_name, dtbs[board_name], args)
 
 if __name__ == "__main__":
     main()
@@ -1,23 +1,30 @@
 import os
 
 from migen import *
+from migen.genlib.cdc import MultiReg
 from litex.soc.interconnect import wishbone
 from litex.soc.integration.soc_core import mem_decoder
 
 from litex.soc.interconnect.csr import *
 from litex.soc.interconnect.csr_eventmanager import *
 
+__all__ = ["GpioISR"]
+
 # GPIO interrupt
 class GpioISR(Module, AutoCSR):
   def __init__(self, pad, rissing_edge_detect = False):
+        # Synchronize pad to sys clock domain
+        pad_sync = Signal()
+        self.specials += MultiReg(pad, pad_sync)
+
         # Add int to module
         self.submodules.ev = EventManager()
 
         if rissing_edge_detect:
             self.ev.gpio_rising_int = EventSourcePulse()
             self.ev.finalize()
-            self.comb += self.ev.gpio_rising_int.trigger.eq(pad)
+            self.comb += self.ev.gpio_rising_int.trigger.eq(pad_sync)
         else:
             self.ev.gpio_falling_int = EventSourceProcess()
             self.ev.finalize()
-            self.comb += self.ev.gpio_falling_int.trigger.eq(pad)
\ No newline at end of file
+            self.comb += self.ev.gpio_falling_int.trigger.eq(pad_sync)
\ No newline at end of file
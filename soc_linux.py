@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import os
-
 from migen import *
 
 from litex.soc.interconnect import wishbone
@@ -89,10 +87,4 @@ def SoCLinux(soc_cls, **kwargs):
                 self.add_constant("FLASHBOOT_LINUX_VEXRISCV", None)
                 self.add_constant("FLASH_BOOT_ADDRESS", None)
 
-        def compile_device_tree(self, name=""):
-            if name != "":
-                name = "_" + name
-            print(name)
-            os.system("dtc -O dtb -o buildroot/rv32.dtb buildroot/board/litex_vexriscv/litex_vexriscv{}.dts".format(name))
-
     return _SoCLinux(**kwargs)